@@ -1,40 +1,340 @@
 from __future__ import annotations
-import os, io, csv, time
+import os, io, functools, queue, re, threading, time
+from contextlib import ExitStack
+from itertools import groupby
 from typing import Any
-from flask import Flask, request, jsonify, send_file, render_template
+from uuid import uuid4
+import orjson
+import psycopg2
+from psycopg2 import extensions as pg_ext
+from flask import Flask, Response, request, jsonify, send_file, render_template
+from flask.json.provider import JSONProvider
 from werkzeug.exceptions import BadRequest
 
 from aws_db import aws_db_connection  # your existing module
 
+
+class OrjsonProvider(JSONProvider):
+    """
+    Flask JSON provider backed by orjson. Responses are built straight from orjson's
+    bytes; anything orjson can't serialize natively (e.g. Decimal) goes through str().
+    """
+    option = orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=str, option=self.option).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=str, option=self.option), mimetype="application/json"
+        )
+
+
 app = Flask(__name__, template_folder="templates", static_folder="static")
+app.json = OrjsonProvider(app)
 
-# Single shared connection (simple demo)
+# Shared connection pools, one per database (see aws_db_connection.borrow)
 db = aws_db_connection()
-_current_db = os.getenv("DB_NAME") or "postgres"  # for display only
+
+MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", 5000))  # rows returned to the editor preview
+MAX_CELL = 2000  # chars per cell in the editor preview
+_JSON_NATIVE = (int, float, bool, type(None))
+_JS_SAFE_INT = 2**53 - 1  # larger numbers lose precision in the browser's JSON.parse
+_SELECT_RE = re.compile(r"^\s*select\b", re.IGNORECASE)
+_SELECT_INTO_RE = re.compile(r"\binto\b", re.IGNORECASE)
+
+# numeric, date, time, timetz, timestamp, timestamptz, interval, json, jsonb:
+# the editor and CSV only stringify these again, so keep Postgres' text instead of parsing to Python objects.
+_TEXT_PASSTHROUGH = pg_ext.new_type(
+    (1700, 1082, 1083, 1266, 1114, 1184, 1186, 114, 3802), "EDITOR_TEXT", lambda value, cur: value
+)
+# CSV exports also keep Postgres' text for bool, bytea, float4/float8 and common array types,
+# so rows written from Python match what COPY ... WITH CSV produces (t/f, \x..., Infinity, {a,b}).
+_CSV_TEXT_PASSTHROUGH = pg_ext.new_type(
+    (16, 17, 700, 701, 1000, 1001, 1005, 1007, 1009, 1014, 1015, 1016, 1021, 1022, 1115, 1182, 1185, 1231, 2951),
+    "CSV_TEXT",
+    lambda value, cur: value,
+)
 
 
 # ----------------------------- Helpers -----------------------------
-def _exec(query: str):
+def _request_db() -> str:
+    """Database this request targets: X-DB header, then ?db=, then the default (DB_NAME)."""
+    return (request.headers.get("X-DB") or request.args.get("db") or "").strip() or db.dbname
+
+
+def _single_select(query: str) -> str | None:
+    """Return query without its trailing ';' if it is a single plain SELECT, else None."""
+    q = query.strip().rstrip(";").rstrip()
+    if not _SELECT_RE.match(q) or ";" in q or _SELECT_INTO_RE.search(q):
+        return None
+    return q
+
+
+def _fetch_batches(cur, size: int = 1000):
+    """Iterate a cursor's rows via fetchmany(size), so only one batch is turned into Python tuples at a time."""
+    while True:
+        batch = cur.fetchmany(size)
+        if not batch:
+            return
+        yield from batch
+
+
+def retry_on_disconnect(fn):
+    """
+    Run fn(cur, query) on a pooled connection to `dbname`. borrow() already pings connections
+    that sat idle; this covers one that still dies under the query (e.g. a failover mid-request)
+    by retrying once on another connection, borrow() discarding the closed one. Only single SELECTs are
+    retried, since anything else may already have run before the reply was lost. Server-side
+    errors (those with a SQLSTATE, like statement timeouts) and failures to connect at all are not retried.
+    """
+    @functools.wraps(fn)
+    def wrapper(query: str, dbname: str | None = None, **kwargs):
+        for attempt in (1, 2):
+            with db.borrow(dbname) as conn:
+                try:
+                    with conn.cursor() as cur:
+                        return fn(cur, query, **kwargs)
+                except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                    if attempt == 2 or e.pgcode is not None or not conn.closed or _single_select(query) is None:
+                        raise
+    return wrapper
+
+
+@retry_on_disconnect
+def _run_query(cur, query: str, for_csv: bool = False):
+    pg_ext.register_type(_TEXT_PASSTHROUGH, cur)
+    if for_csv:
+        pg_ext.register_type(_CSV_TEXT_PASSTHROUGH, cur)
+    cur.execute(query)
+    cols = [c[0] for c in (cur.description or [])]
+    rows = cur.fetchall() if cur.description else []
+    return cols, rows, cur.rowcount
+
+
+def _exec(query: str, dbname: str | None = None, for_csv: bool = False):
     """Execute query via raw cursor to always return (columns, rows, rowcount, duration_ms)."""
     if not query or not query.strip():
         raise BadRequest("No query provided.")
     started = time.perf_counter()
     try:
-        with db.conn.cursor() as cur:
-            cur.execute(query)
-            cols = [c[0] for c in (cur.description or [])]
-            rows = cur.fetchall() if cur.description else []
-            rowcount = cur.rowcount
+        cols, rows, rowcount = _run_query(query, dbname=dbname, for_csv=for_csv)
     except Exception as e:
         raise BadRequest(str(e))
     duration_ms = round((time.perf_counter() - started) * 1000, 2)
     return cols or [], rows or [], rowcount, duration_ms
 
 
+class _StreamBody:
+    """
+    Response body wrapping an iterator. close() always runs `release`, including when the server
+    closes the response without ever iterating it (a generator's finally would not run then).
+    """
+
+    def __init__(self, it, release):
+        self._it = it
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._it)
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._it, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._release()
+
+
+def _exec_stream(select: str, dbname: str | None = None, itersize: int = 1000):
+    """
+    Run a single SELECT (see _single_select) through a server-side (named) cursor and return
+    (columns, rows). Only ~itersize rows are held in memory at a time.
+    Named cursors need a transaction, so a pooled connection is held (autocommit off) until rows is closed.
+    """
+    stack = ExitStack()
+    conn = stack.enter_context(db.borrow(dbname))
+    conn.autocommit = False
+    cur = conn.cursor(name=f"exp_{uuid4().hex}")
+    cur.itersize = itersize
+    pg_ext.register_type(_TEXT_PASSTHROUGH, cur)
+    pg_ext.register_type(_CSV_TEXT_PASSTHROUGH, cur)
+    try:
+        cur.execute(select)
+        # description is only populated for named cursors after the first fetch
+        first = cur.fetchmany(itersize)
+    except psycopg2.Error as e:
+        stack.close()  # the pool rolls back the failed transaction
+        raise BadRequest(str(e))
+    cols = [c[0] for c in (cur.description or [])]
+
+    def rows_iter():
+        yield from first
+        try:
+            yield from cur
+        except psycopg2.Error as e:
+            raise BadRequest(str(e))
+
+    released = False
+
+    def release():
+        nonlocal released
+        if released:
+            return  # the connection may already be back in the pool
+        released = True
+        try:
+            cur.close()
+            conn.rollback()
+        except psycopg2.Error:
+            pass  # borrow() discards it if the connection broke
+        finally:
+            stack.close()
+
+    return cols, _StreamBody(rows_iter(), release)
+
+
+_TLS = threading.local()
+
+
+def _csv_buffer() -> bytearray:
+    """Per-thread bytearray for buffered CSV exports, emptied before each use instead of reallocated."""
+    buf = getattr(_TLS, "buf", None)
+    if buf is None:
+        buf = _TLS.buf = bytearray()
+    buf.clear()
+    return buf
+
+
+_CSV_NEEDS_QUOTE = re.compile(r'[,"\r\n]').search
+
+
+def _csv_field(v: Any) -> str:
+    if v is None:
+        return ""  # NULL is the only unquoted empty field
+    s = v if isinstance(v, str) else str(v)
+    if not s or _CSV_NEEDS_QUOTE(s):
+        return '"' + s.replace('"', '""') + '"'
+    return s
+
+
+def _csv_line(row) -> bytes:
+    """One CSV record in the same dialect as COPY ... TO STDOUT WITH CSV (LF line endings)."""
+    if len(row) == 1 and row[0] == "\\.":
+        return b'"\\."\n'  # COPY quotes a lone \. so it can't be read back as end-of-data
+    return (",".join(map(_csv_field, row)) + "\n").encode("utf-8")
+
+
+class _CopyCancelled(Exception):
+    pass
+
+
+class _QueueWriter(io.RawIOBase):
+    """
+    File-like sink for cursor.copy_expert(): batches COPY rows into ~chunk_size
+    byte chunks and hands them to a bounded queue read by the response generator.
+    """
+
+    def __init__(self, q: queue.Queue, cancelled: threading.Event, chunk_size: int = 64 * 1024):
+        super().__init__()
+        self._q = q
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._buf += b
+        if len(self._buf) >= self._chunk_size:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+        return len(b)
+
+    def flush_tail(self) -> None:
+        if self._buf:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+
+    def _put(self, item) -> None:
+        while not self._cancelled.is_set():
+            try:
+                self._q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _CopyCancelled()
+
+
+_COPY_DONE = object()
+
+
+def _copy_csv_stream(select: str, dbname: str | None = None, max_chunks: int = 16):
+    """
+    Stream `COPY (select) TO STDOUT WITH CSV HEADER` as an iterator of byte chunks.
+    Postgres does the CSV encoding. copy_expert() blocks until COPY finishes, so it runs
+    on a worker thread feeding a bounded queue (~max_chunks x 64 KiB in memory). The first
+    chunk is awaited here so SQL errors raise BadRequest before the response starts; closing
+    the returned body cancels the COPY.
+    """
+    q: queue.Queue = queue.Queue(maxsize=max_chunks)
+    cancelled = threading.Event()
+
+    def run_copy():
+        try:
+            with db.borrow(dbname) as conn:
+                writer = _QueueWriter(q, cancelled)
+                try:
+                    with conn.cursor() as cur:
+                        cur.copy_expert(f"COPY (\n{select}\n) TO STDOUT WITH CSV HEADER", writer)
+                    writer.flush_tail()
+                except _CopyCancelled:
+                    conn.close()  # COPY was abandoned mid-stream; don't hand this connection back
+                    return
+            q.put(_COPY_DONE)
+        except Exception as e:
+            if not cancelled.is_set():
+                q.put(e)
+
+    worker = threading.Thread(target=run_copy, daemon=True)
+    worker.start()
+
+    def next_item():
+        while True:
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                if not worker.is_alive() and q.empty():
+                    return RuntimeError("COPY ended without a result")
+
+    first = next_item()
+    if isinstance(first, Exception):
+        cancelled.set()
+        raise BadRequest(str(first))
+
+    def chunks():
+        item = first
+        while item is not _COPY_DONE:
+            if isinstance(item, Exception):
+                raise BadRequest(str(item))
+            yield item
+            item = next_item()
+
+    return _StreamBody(chunks(), cancelled.set)
+
+
 # ----------------------------- Pages ------------------------------
 @app.get("/")
 def index():
-    return render_template("index.html", current_db=_current_db)
+    return render_template("index.html", current_db=_request_db())
 
 
 # ----------------------------- DB mgmt APIs ------------------------
@@ -44,7 +344,7 @@ def api_list_databases():
         names = db.list_databases()
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    return jsonify({"databases": names, "current": _current_db})
+    return jsonify({"databases": names, "current": _request_db()})
 
 
 @app.post("/api/databases")
@@ -62,20 +362,69 @@ def api_create_database():
 
 @app.post("/api/connect")
 def api_connect_to():
-    global _current_db
+    """
+    Check that a database is reachable (creating it if missing). Nothing is switched
+    server-side: the client sends the name back on later requests as X-DB.
+    """
     payload = request.get_json(silent=True) or {}
     dbname: str = (payload.get("name") or "").strip()
     if not dbname:
         raise BadRequest("Database name is required.")
     try:
-        db.connect_to(dbname)
-        _current_db = dbname
+        db.create_database(dbname)
+        db.execute("SELECT 1", dbname=dbname)
     except Exception as e:
         return jsonify({"error": str(e)}), 400
-    return jsonify({"ok": True, "current": _current_db})
+    return jsonify({"ok": True, "current": dbname})
 
 
 # ----------------------------- Tables & Schemas --------------------
+# Catalog queries behind /api/table-schemas ($1 = schema). They run as named prepared
+# statements, PREPAREd once per pooled connection (see aws_db_connection.prepare).
+_SCHEMA_META_SQL = {
+    # Indexes for all tables in schema
+    "p_indexes": """
+        SELECT tablename, indexname, indexdef
+        FROM pg_indexes
+        WHERE schemaname = $1
+        ORDER BY tablename, indexname
+    """,
+    # Partitioned parents: strategy + one row per key column, in key order
+    # (grouped per table in Python rather than with array_agg(... ORDER BY) on the server)
+    "p_partition_keys": """
+        SELECT
+          c.relname AS tablename,
+          CASE pt.partstrat
+            WHEN 'l' THEN 'LIST'
+            WHEN 'r' THEN 'RANGE'
+            WHEN 'h' THEN 'HASH'
+          END AS strategy,
+          a.attname
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN unnest(pt.partattrs) WITH ORDINALITY AS pa(attnum, ord) ON true
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = pa.attnum
+        WHERE n.nspname = $1
+        ORDER BY c.relname, pa.ord
+    """,
+    # Children (the actual partitions) with bounds
+    "p_partition_children": """
+        SELECT
+          parent.relname AS parent,
+          child.relname  AS partition_name,
+          pg_get_expr(child.relpartbound, child.oid, true) AS bounds
+        FROM pg_inherits i
+        JOIN pg_class child  ON child.oid = i.inhrelid
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_namespace np ON np.oid = parent.relnamespace
+        JOIN pg_namespace nc ON nc.oid = child.relnamespace
+        WHERE np.nspname = $1 AND nc.nspname = $1
+        ORDER BY parent.relname, child.relname
+    """,
+}
+
+
 @app.get("/api/table-schemas")
 def api_table_schemas():
     """
@@ -83,103 +432,55 @@ def api_table_schemas():
     plus index and partition metadata.
     """
     schema = request.args.get("schema", "public")
+    dbname = _request_db()
     try:
         # Existing: use your helper to get CREATE TABLE DDL
-        mapping = db.list_table_schemas(schema=schema)  # {table_name: CREATE TABLE ...}
+        mapping = db.list_table_schemas_bulk(schema=schema, dbname=dbname)  # {table_name: CREATE TABLE ...}
         ordered_items = sorted(mapping.items(), key=lambda kv: kv[0])
         table_names = [name for name, _ in ordered_items]
+        known = set(table_names)
 
-        indexes: dict[str, list[dict]] = {t: [] for t in table_names}
-        partitions: dict[str, dict] = {t: {} for t in table_names}
+        # Only tables that actually have indexes / partition info get an entry.
+        indexes: dict[str, list[dict]] = {}
+        partitions: dict[str, dict] = {}
 
-        with db.conn.cursor() as cur:
+        with db.borrow(dbname) as conn, conn.cursor() as cur:
             # ---- Indexes for all tables in schema
-            cur.execute(
-                """
-                SELECT tablename, indexname, indexdef
-                FROM pg_indexes
-                WHERE schemaname = %s
-                ORDER BY tablename, indexname;
-                """,
-                (schema,),
-            )
-            for tablename, indexname, indexdef in cur.fetchall():
-                if tablename in indexes:
-                    indexes[tablename].append({"name": indexname, "def": indexdef})
+            db.execute_prepared(cur, _SCHEMA_META_SQL, "p_indexes", (schema,))
+            for tablename, indexname, indexdef in _fetch_batches(cur):
+                if tablename in known:
+                    indexes.setdefault(tablename, []).append({"name": indexname, "def": indexdef})
 
             # ---- Partitioned parents: strategy + key columns
-            cur.execute(
-                """
-                WITH part AS (
-                  SELECT
-                    c.relname AS tablename,
-                    CASE pt.partstrat
-                      WHEN 'l' THEN 'LIST'
-                      WHEN 'r' THEN 'RANGE'
-                      WHEN 'h' THEN 'HASH'
-                    END AS strategy,
-                    pt.partattrs
-                  FROM pg_partitioned_table pt
-                  JOIN pg_class c ON c.oid = pt.partrelid
-                  JOIN pg_namespace n ON n.oid = c.relnamespace
-                  WHERE n.nspname = %s
-                )
-                SELECT
-                  p.tablename,
-                  p.strategy,
-                  array_agg(a.attname ORDER BY a.attnum) AS key_columns
-                FROM part p
-                JOIN pg_class c ON c.relname = p.tablename
-                JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = %s
-                JOIN unnest(p.partattrs) WITH ORDINALITY AS pa(attnum, ord) ON true
-                JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = pa.attnum
-                GROUP BY p.tablename, p.strategy
-                ORDER BY p.tablename;
-                """,
-                (schema, schema),
-            )
-            for tablename, strategy, key_columns in cur.fetchall():
-                if tablename in partitions:
-                    partitions[tablename].update({
+            db.execute_prepared(cur, _SCHEMA_META_SQL, "p_partition_keys", (schema,))
+            for tablename, key_rows in groupby(_fetch_batches(cur), key=lambda r: r[0]):
+                key_rows = list(key_rows)
+                if tablename in known:
+                    partitions.setdefault(tablename, {}).update({
                         "is_partitioned": True,
-                        "strategy": strategy,
-                        "key_columns": key_columns or [],
+                        "strategy": key_rows[0][1],
+                        "key_columns": [attname for _, _, attname in key_rows],
                         "children": [],
                     })
 
             # ---- Children (the actual partitions) with bounds; also record parent links
-            cur.execute(
-                """
-                SELECT
-                  parent.relname AS parent,
-                  child.relname  AS partition_name,
-                  pg_get_expr(child.relpartbound, child.oid, true) AS bounds
-                FROM pg_inherits i
-                JOIN pg_class child  ON child.oid = i.inhrelid
-                JOIN pg_class parent ON parent.oid = i.inhparent
-                JOIN pg_namespace np ON np.oid = parent.relnamespace
-                JOIN pg_namespace nc ON nc.oid = child.relnamespace
-                WHERE np.nspname = %s AND nc.nspname = %s
-                ORDER BY parent.relname, child.relname;
-                """,
-                (schema, schema),
-            )
-            rows = cur.fetchall()
+            db.execute_prepared(cur, _SCHEMA_META_SQL, "p_partition_children", (schema,))
             # Add child listing to parents, and mark children as partitions
-            for parent, child, bounds in rows:
-                if parent in partitions:
-                    if not partitions[parent].get("is_partitioned"):
-                        partitions[parent].update({
+            for parent, child, bounds in _fetch_batches(cur):
+                if parent in known:
+                    part = partitions.setdefault(parent, {})
+                    if not part.get("is_partitioned"):
+                        part.update({
                             "is_partitioned": True,
                             "strategy": None,
                             "key_columns": [],
                             "children": [],
                         })
-                    partitions[parent]["children"].append({
+                    part["children"].append({
                         "name": child, "bounds": bounds or ""
                     })
-                if child in partitions:
-                    partitions[child].update({
+                if child in known:
+                    partitions.setdefault(child, {}).update({
                         "is_partition": True,
                         "parent": parent,
                         "bounds": bounds or "",
@@ -188,7 +489,7 @@ def api_table_schemas():
         return jsonify({
             "schema": schema,
             "tables": table_names,
-            "ddl": {name: ddl for name, ddl in ordered_items},
+            "ddl": dict(ordered_items),
             "indexes": indexes,
             "partitions": partitions,
         })
@@ -202,16 +503,37 @@ def api_table_schemas():
 def api_sql():
     payload = request.get_json(silent=True) or {}
     query: str = (payload.get("query") or "").strip()
-    cols, rows, rowcount, duration_ms = _exec(query)
-
-    def clip(v: Any) -> Any:
-        s = "" if v is None else str(v)
-        return s if len(s) <= 2000 else s[:2000] + "…"
+    select = _single_select(query)
+    if select is not None:
+        # Only fetch what the preview can show; the extra row tells us it was cut off.
+        query = f"SELECT * FROM (\n{select}\n) _sub LIMIT {MAX_ROWS + 1}"  # newlines keep trailing -- comments inside
+    cols, rows, rowcount, duration_ms = _exec(query, _request_db())
+
+    truncated = select is not None and len(rows) > MAX_ROWS
+    if truncated:
+        rows = rows[:MAX_ROWS]
+        rowcount = MAX_ROWS
+
+    # bools/None and numbers within ±(2**53 - 1) go straight to the JSON encoder; bigger
+    # numbers (e.g. bigint IDs), NaN/Infinity, strings and types JSON can't represent
+    # (e.g. datetime/Decimal) are stringified/clipped.
+    rows_out = [list(r) for r in rows]
+    for r in rows_out:
+        for i, v in enumerate(r):
+            if isinstance(v, _JSON_NATIVE) and (
+                v is None or v is True or v is False or -_JS_SAFE_INT <= v <= _JS_SAFE_INT
+            ):
+                continue
+            if not isinstance(v, str):
+                v = r[i] = str(v)
+            if len(v) > MAX_CELL:
+                r[i] = v[:MAX_CELL] + "…"
 
     return jsonify({
         "columns": cols,
-        "rows": [[clip(c) for c in r] for r in rows],
+        "rows": rows_out,
         "rowcount": rowcount,
+        "truncated": truncated,
         "duration_ms": duration_ms,
     })
 
@@ -220,29 +542,67 @@ def api_sql():
 def api_sql_csv():
     payload = request.get_json(silent=True) or {}
     query: str = (payload.get("query") or "").strip()
-    cols, rows, _, _ = _exec(query)
-
-    import csv, io
-    sio = io.StringIO()
-    w = csv.writer(sio)
-    if cols:
-        w.writerow(cols)
-    w.writerows(rows)
-    data = io.BytesIO(sio.getvalue().encode("utf-8"))
-    return send_file(
-        data,
+    dbname = _request_db()
+    select = _single_select(query)
+    if select is None:
+        # DDL/DML and multi-statement scripts: run as-is and export the last result set.
+        # (A named cursor would DECLARE over the first statement only.)
+        cols, rows, _, _ = _exec(query, dbname, for_csv=True)
+        buf = _csv_buffer()
+        for row in ([cols, *rows] if cols else rows):
+            buf += _csv_line(row)
+        return send_file(
+            io.BytesIO(buf),  # takes its own copy, so the buffer is free for the next export right away
+            mimetype="text/csv",
+            as_attachment=True,
+            download_name="query_results.csv",
+        )
+
+    # COPY isn't available once psycogreen installs a wait callback (gevent, see wsgi.py);
+    # the named-cursor stream below works in both modes.
+    if pg_ext.get_wait_callback() is None:
+        return Response(
+            _copy_csv_stream(select, dbname),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=query_results.csv"},
+        )
+
+    cols, rows = _exec_stream(select, dbname)
+
+    def generate(flush_bytes: int = 64 * 1024):
+        buf = bytearray()
+        if cols:
+            buf += _csv_line(cols)
+        for row in rows:
+            buf += _csv_line(row)
+            if len(buf) >= flush_bytes:
+                yield bytes(buf)
+                buf.clear()
+        if buf:
+            yield bytes(buf)
+
+    return Response(
+        _StreamBody(generate(), rows.close),  # ends the cursor's transaction even if the body is never read
         mimetype="text/csv",
-        as_attachment=True,
-        download_name="query_results.csv",
+        headers={"Content-Disposition": "attachment; filename=query_results.csv"},
     )
 
 
+HEALTH_CACHE_S = int(os.getenv("HEALTH_CACHE_MS", 2000)) / 1000.0
+_last_ok_ts: dict[str, float] = {}  # dbname -> monotonic time of last successful SELECT 1
+
+
 @app.get("/healthz")
 def healthz():
+    dbname = _request_db()
+    if time.monotonic() - _last_ok_ts.get(dbname, float("-inf")) < HEALTH_CACHE_S:
+        return {"ok": True, "db": dbname, "cached": True}
     try:
-        db.execute("SELECT 1")
-        return {"ok": True, "db": _current_db}
+        db.execute("SELECT 1", dbname=dbname)
+        _last_ok_ts[dbname] = time.monotonic()
+        return {"ok": True, "db": dbname}
     except Exception as e:
+        _last_ok_ts.pop(dbname, None)
         return {"ok": False, "error": str(e)}, 500
 
 
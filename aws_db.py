@@ -1,7 +1,15 @@
 import os
-from typing import Any, Iterable, Optional, Sequence, Tuple, Union, List, Literal, Dict
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Any, Iterable, Iterator, Optional, Sequence, Tuple, Union, List, Literal, Dict
 
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
+import psycopg2.pool
 from psycopg2 import sql
 
 
@@ -10,9 +18,49 @@ DB_PORT = os.getenv("DB_PORT") or 5432
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 DB_NAME = os.getenv("DB_NAME") or "postgres"
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX") or 10)
+PG_PING_AFTER = float(os.getenv("PG_PING_AFTER") or 30)  # seconds idle before a connection is pinged on checkout
+DATABASES_CACHE_TTL = 30.0  # seconds list_databases() results are reused
+DDL_WORKERS = 8  # concurrent per-table DDL calls when pg_get_tabledef is used
 
 FetchMode = Literal["none", "one", "all"]
 
+
+class _PooledConnection(psycopg2.extensions.connection):
+    """
+    psycopg2 connection that remembers which named statements were PREPAREd on it
+    and when it was last handed back (see aws_db_connection._usable).
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.prepared: set = set()
+        self.idle_since = time.monotonic()
+
+
+class _KeepIdlePool(psycopg2.pool.ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that opens one connection up front and the rest on demand, but keeps
+    every returned connection (up to maxconn) idle for reuse. The stock pool closes any
+    connection handed back while minconn others are already idle.
+    """
+
+    def __init__(self, maxconn: int, *args: Any, **kwargs: Any) -> None:
+        super().__init__(1, maxconn, *args, **kwargs)
+        self.minconn = maxconn  # _putconn keeps returned connections while fewer than minconn are idle
+
+    def retire(self) -> None:
+        """
+        Close the idle connections and stop taking connections back. Unlike closeall(), connections
+        still checked out keep working; borrow() closes them when putconn() refuses them.
+        """
+        with self._lock:
+            idle, self._pool = self._pool, []
+            self.closed = True
+        for conn in idle:
+            conn.close()
+
+
 class aws_db_connection:
     def __init__(
         self,
@@ -23,6 +71,7 @@ class aws_db_connection:
         dbname: str = DB_NAME,
         admin_dbname: str = "postgres",
         autocommit: bool = True,
+        pool_max: int = PG_POOL_MAX,
     ) -> None:
         self.host = host
         self.port = int(port) if port else 5432
@@ -30,36 +79,144 @@ class aws_db_connection:
         self.password = password
         self.admin_dbname = admin_dbname
         self.autocommit = autocommit
-        self.conn = self._get_or_create_connection(dbname)
+        self.pool_max = pool_max
+        self._admin_conn = None
+        self._admin_lock = threading.Lock()
+        self._rs_tabledef_avail: Dict[str, bool] = {}
+        self._databases_cache: Optional[Tuple[float, List[str]]] = None
+        self._pools: Dict[str, psycopg2.pool.ThreadedConnectionPool] = {}
+        self._pool_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._pools_lock = threading.Lock()
+        self.dbname = dbname  # default database for calls that don't pass dbname
+        self._pools[dbname] = self._get_or_create_pool(dbname)
 
     # ---------- core connect/create ----------
-    def _connect(self, dbname: str):
-        conn = psycopg2.connect(
+    def _connect_kwargs(self, dbname: str) -> Dict[str, Any]:
+        return dict(
             host=self.host,
             port=self.port,
             dbname=dbname,
             user=self.user,
             password=self.password,
+            # keep idle sockets alive through NAT/security-group idle timeouts
+            keepalives=1,
+            keepalives_idle=30,
+            connection_factory=_PooledConnection,
         )
+
+    def _connect(self, dbname: str):
+        conn = psycopg2.connect(**self._connect_kwargs(dbname))
         conn.autocommit = self.autocommit
         return conn
 
-    def _get_or_create_connection(self, dbname: str):
+    def _make_pool(self, dbname: str) -> psycopg2.pool.ThreadedConnectionPool:
+        return _KeepIdlePool(self.pool_max, **self._connect_kwargs(dbname))
+
+    def _get_or_create_pool(self, dbname: str) -> psycopg2.pool.ThreadedConnectionPool:
         try:
-            return self._connect(dbname)
+            return self._make_pool(dbname)
         except psycopg2.OperationalError as e:
             if "does not exist" in str(e):
                 self._create_database_internal(dbname)
-                return self._connect(dbname)
+                return self._make_pool(dbname)
             raise
 
-    def _create_database_internal(self, dbname: str) -> None:
-        admin = self._connect(self.admin_dbname)
+    def pool_for(self, dbname: Optional[str] = None) -> psycopg2.pool.ThreadedConnectionPool:
+        """
+        Connection pool for `dbname` (default: self.dbname), opened on first use.
+        Unlike connect_to(), this never creates a missing database.
+        """
+        dbname = dbname or self.dbname
+        pool = self._pools.get(dbname)
+        if pool is None:
+            with self._pools_lock:
+                pool = self._pools.get(dbname)
+                if pool is None:
+                    pool = self._pools[dbname] = self._make_pool(dbname)
+        return pool
+
+    def _slots_for(self, dbname: str) -> threading.BoundedSemaphore:
+        slots = self._pool_slots.get(dbname)
+        if slots is None:
+            with self._pools_lock:
+                slots = self._pool_slots.setdefault(dbname, threading.BoundedSemaphore(self.pool_max))
+        return slots
+
+    @contextmanager
+    def borrow(self, dbname: Optional[str] = None) -> Iterator[Any]:
+        """
+        Check a connection to `dbname` (default: self.dbname) out of its pool for the
+        duration of the block, waiting for one to free up when all pool_max are in use
+        (ThreadedConnectionPool itself would raise). Broken connections are discarded
+        instead of being returned. Connections idle for PG_PING_AFTER seconds or more are
+        pinged first; dead ones are dropped and the next idle (or a new) connection is tried.
+        """
+        dbname = dbname or self.dbname
+        self.pool_for(dbname)  # open it (or fail) before a slot semaphore is kept for this name
+        with self._slots_for(dbname):
+            pool = self.pool_for(dbname)
+            while True:
+                conn = pool.getconn()
+                if not conn.closed and conn.autocommit != self.autocommit:
+                    conn.autocommit = self.autocommit
+                if self._usable(conn):
+                    break
+                self._putconn(pool, conn)
+            try:
+                yield conn
+            finally:
+                conn.idle_since = time.monotonic()
+                self._putconn(pool, conn)
+
+    @staticmethod
+    def _putconn(pool: psycopg2.pool.ThreadedConnectionPool, conn: Any) -> None:
         try:
-            with admin.cursor() as cur:
-                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(dbname)))
-        finally:
-            admin.close()
+            pool.putconn(conn, close=bool(conn.closed))
+        except psycopg2.pool.PoolError:
+            # pool was replaced by reconnect() while we held the connection
+            conn.close()
+
+    @staticmethod
+    def _usable(conn: Any) -> bool:
+        """
+        False if `conn` is closed, or has sat idle for PG_PING_AFTER seconds and fails a
+        SELECT 1 (e.g. RDS dropped the socket while the Lambda container was frozen).
+        """
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.idle_since < PG_PING_AFTER:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            if not conn.autocommit:
+                conn.rollback()
+            return True
+        except psycopg2.Error:
+            conn.close()
+            return False
+
+    @contextmanager
+    def _admin(self) -> Iterator[Any]:
+        """
+        Shared connection to the admin DB, opened lazily and reused across calls.
+        Like borrow(), it is pinged after sitting idle and reopened if the server dropped it.
+        """
+        with self._admin_lock:
+            if self._admin_conn is None or not self._usable(self._admin_conn):
+                self._admin_conn = self._connect(self.admin_dbname)
+            try:
+                yield self._admin_conn
+            finally:
+                if self._admin_conn.closed:
+                    self._admin_conn = None
+                else:
+                    self._admin_conn.idle_since = time.monotonic()
+
+    def _create_database_internal(self, dbname: str) -> None:
+        with self._admin() as admin, admin.cursor() as cur:
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(dbname)))
+        self._databases_cache = None
 
     # ---------- public API ----------
     def execute(
@@ -67,8 +224,9 @@ class aws_db_connection:
         query: Union[str, sql.SQL],
         params: Optional[Union[Sequence[Any], Iterable[Any], dict]] = None,
         fetch: FetchMode = "none",
+        dbname: Optional[str] = None,
     ) -> Optional[Union[Tuple, List[Tuple]]]:
-        with self.conn.cursor() as cur:
+        with self.borrow(dbname) as conn, conn.cursor() as cur:
             cur.execute(query, params)
             if fetch == "one":
                 return cur.fetchone()
@@ -76,36 +234,81 @@ class aws_db_connection:
                 return cur.fetchall()
             return None
 
+    def prepare(self, conn: Any, statements: Dict[str, str]) -> None:
+        """
+        PREPARE each `name -> query` (with $1, $2 ... placeholders) on `conn`, skipping
+        names already prepared on that connection. Statements last for the session,
+        so each pooled connection parses/plans them once.
+        """
+        todo = {name: query for name, query in statements.items() if name not in conn.prepared}
+        if not todo:
+            return
+        with conn.cursor() as cur:
+            cur.execute(";\n".join(f"PREPARE {name} AS {query}" for name, query in todo.items()))
+        conn.prepared.update(todo)
+
+    def execute_prepared(self, cur: Any, statements: Dict[str, str], name: str, params: Sequence[Any] = ()) -> None:
+        """Run `EXECUTE name(params)` on cur, preparing the statement on its connection first if needed."""
+        conn = cur.connection
+        self.prepare(conn, statements)
+        execute = f"EXECUTE {name}({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {name}"
+        try:
+            cur.execute(execute, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # this statement was dropped (DEALLOCATE / DISCARD ALL run from the editor); the others
+            # may still exist, so re-PREPARE only this one and let them recover the same way if needed
+            conn.prepared.discard(name)
+            self.prepare(conn, {name: statements[name]})
+            cur.execute(execute, params)
+
     def create_database(self, dbname: str) -> None:
-        if dbname in self.list_databases():
+        if dbname in self.list_databases(use_cache=False):
             return
         self._create_database_internal(dbname)
 
     def connect_to(self, dbname: str) -> None:
-        if getattr(self, "conn", None):
-            try:
-                self.conn.close()
-            except Exception:
-                pass
-        self.conn = self._get_or_create_connection(dbname)
+        """Make `dbname` the default database (creating it if missing) with a fresh pool."""
+        self._replace_pool(dbname, self._get_or_create_pool(dbname))
+        self.dbname = dbname
 
-    def list_databases(self) -> List[str]:
-        admin = self._connect(self.admin_dbname)
-        try:
-            with admin.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT datname
-                    FROM pg_database
-                    WHERE datistemplate = false
-                    ORDER BY datname;
-                    """
-                )
-                return [r[0] for r in cur.fetchall()]
-        finally:
-            admin.close()
+    def reconnect(self, dbname: Optional[str] = None) -> None:
+        """
+        Replace the pool for `dbname` (default: self.dbname) with new connections.
+        Like pool_for(), this never creates a missing database.
+        """
+        dbname = dbname or self.dbname
+        self._replace_pool(dbname, self._make_pool(dbname))
+
+    def _replace_pool(self, dbname: str, pool: psycopg2.pool.ThreadedConnectionPool) -> None:
+        with self._pools_lock:
+            old = self._pools.get(dbname)
+            self._pools[dbname] = pool
+        self._rs_tabledef_avail.pop(dbname, None)
+        if old is not None:
+            old.retire()  # in-flight queries on the old pool finish normally
+
+    def list_databases(self, use_cache: bool = True) -> List[str]:
+        """
+        Non-template databases. Results are reused for DATABASES_CACHE_TTL seconds
+        unless use_cache=False; creating a database through this class clears the cache.
+        """
+        cached = self._databases_cache
+        if use_cache and cached and time.monotonic() - cached[0] < DATABASES_CACHE_TTL:
+            return list(cached[1])
+        with self._admin() as admin, admin.cursor() as cur:
+            cur.execute(
+                """
+                SELECT datname
+                FROM pg_database
+                WHERE datistemplate = false
+                ORDER BY datname;
+                """
+            )
+            names = [r[0] for r in cur.fetchall()]
+        self._databases_cache = (time.monotonic(), names)
+        return list(names)
 
-    def list_tables(self, schema: str = "public") -> List[str]:
+    def list_tables(self, schema: str = "public", dbname: Optional[str] = None) -> List[str]:
         rows = self.execute(
             """
             SELECT table_name
@@ -115,14 +318,19 @@ class aws_db_connection:
             """,
             (schema,),
             fetch="all",
+            dbname=dbname,
         )
         return [r[0] for r in rows] if rows else []
 
     # ---------- NEW: schema extraction ----------
-    def _redshift_pg_get_tabledef_available(self) -> bool:
+    def _redshift_pg_get_tabledef_available(self, dbname: Optional[str] = None) -> bool:
         """
         Detect if Redshift-style pg_get_tabledef(text) exists.
+        Probed once per database; reconnect()/connect_to() clear the cached answer.
         """
+        dbname = dbname or self.dbname
+        if dbname in self._rs_tabledef_avail:
+            return self._rs_tabledef_avail[dbname]
         row = self.execute(
             """
             SELECT COUNT(*)
@@ -131,17 +339,21 @@ class aws_db_connection:
             WHERE p.proname = 'pg_get_tabledef';
             """,
             fetch="one",
+            dbname=dbname,
         )
-        return bool(row and row[0] > 0)
+        self._rs_tabledef_avail[dbname] = avail = bool(row and row[0] > 0)
+        return avail
 
-    def table_schema(self, table_name: str, schema: str = "public") -> str:
+    def table_schema(self, table_name: str, schema: str = "public", dbname: Optional[str] = None) -> str:
         """
         Return a CREATE TABLE statement for one table.
         Works on Postgres (reconstructs) and Redshift (native function if present).
         """
         # Redshift shortcut if available
-        if self._redshift_pg_get_tabledef_available():
-            row = self.execute("SELECT pg_get_tabledef(%s);", (f'{schema}.{table_name}',), fetch="one")
+        if self._redshift_pg_get_tabledef_available(dbname):
+            row = self.execute(
+                "SELECT pg_get_tabledef(%s);", (f'{schema}.{table_name}',), fetch="one", dbname=dbname
+            )
             if row and row[0]:
                 return row[0].rstrip(";") + ";"
 
@@ -154,6 +366,7 @@ class aws_db_connection:
             """,
             (schema, table_name),
             fetch="one",
+            dbname=dbname,
         )
         if not exists:
             raise ValueError(f"Table {schema}.{table_name} does not exist.")
@@ -181,22 +394,9 @@ class aws_db_connection:
             """,
             (schema, table_name),
             fetch="all",
+            dbname=dbname,
         )
 
-        col_lines = []
-        for _attnum, name, dtype, not_null, default_expr, identity_kind in cols:
-            parts = [sql.Identifier(name).as_string(self.conn), dtype]
-            if identity_kind in ("a", "d"):
-                parts.append(
-                    "GENERATED ALWAYS AS IDENTITY" if identity_kind == "a" else "GENERATED BY DEFAULT AS IDENTITY"
-                )
-                # If identity, ignore default_expr (Postgres handles it via identity)
-            elif default_expr:
-                parts.append(f"DEFAULT {default_expr}")
-            if not_null:
-                parts.append("NOT NULL")
-            col_lines.append(" ".join(parts))
-
         # Constraints (PK/UNIQUE/CHECK/FK) inside CREATE TABLE
         constraints = self.execute(
             """
@@ -215,37 +415,143 @@ class aws_db_connection:
             """,
             (schema, table_name),
             fetch="all",
+            dbname=dbname,
         )
 
+        with self.borrow(dbname) as conn:
+            return self._build_create_table(conn, schema, table_name, cols or [], constraints or [])
+
+    def _build_create_table(
+        self,
+        conn: Any,
+        schema: str,
+        table_name: str,
+        cols: Sequence[Tuple],
+        constraints: Sequence[Tuple],
+    ) -> str:
+        """
+        Assemble CREATE TABLE DDL from pg_attribute rows
+        (attnum, attname, data_type, not_null, default_expr, identity_kind)
+        and pg_constraint rows (conname, contype, condef). `conn` is only used for identifier quoting.
+        """
+        col_lines = []
+        for _attnum, name, dtype, not_null, default_expr, identity_kind in cols:
+            parts = [sql.Identifier(name).as_string(conn), dtype]
+            if identity_kind in ("a", "d"):
+                parts.append(
+                    "GENERATED ALWAYS AS IDENTITY" if identity_kind == "a" else "GENERATED BY DEFAULT AS IDENTITY"
+                )
+                # If identity, ignore default_expr (Postgres handles it via identity)
+            elif default_expr:
+                parts.append(f"DEFAULT {default_expr}")
+            if not_null:
+                parts.append("NOT NULL")
+            col_lines.append(" ".join(parts))
+
         for conname, contype, condef in constraints:
             # contype: p=primary, u=unique, f=foreign, c=check, x=exclusion
             # We’ll name constraints to be explicit
-            ident = sql.Identifier(conname).as_string(self.conn)
+            ident = sql.Identifier(conname).as_string(conn)
             col_lines.append(f"CONSTRAINT {ident} {condef}")
 
         create_stmt = (
-            f"CREATE TABLE {sql.Identifier(schema).as_string(self.conn)}."
-            f"{sql.Identifier(table_name).as_string(self.conn)} (\n  "
+            f"CREATE TABLE {sql.Identifier(schema).as_string(conn)}."
+            f"{sql.Identifier(table_name).as_string(conn)} (\n  "
             + ",\n  ".join(col_lines)
             + "\n);"
         )
         return create_stmt
 
-    def list_table_schemas(self, schema: str = "public") -> Dict[str, str]:
+    def list_table_schemas(self, schema: str = "public", dbname: Optional[str] = None) -> Dict[str, str]:
         """
         Return a mapping of table_name -> CREATE TABLE statement for all tables in `schema`.
         """
-        tables = self.list_tables(schema=schema)
-        return {t: self.table_schema(t, schema=schema) for t in tables}
+        return self.list_table_schemas_bulk(schema=schema, dbname=dbname)
+
+    def list_table_schemas_bulk(self, schema: str = "public", dbname: Optional[str] = None) -> Dict[str, str]:
+        """
+        Same output as calling table_schema() per table, but reads columns and
+        constraints for the whole schema in one query each instead of 3-4 per table.
+        """
+        tables = self.list_tables(schema=schema, dbname=dbname)
+        if not tables:
+            return {}
+
+        # Redshift shortcut if available. It is still one call per table, so overlap the
+        # round trips: each worker borrows its own pooled connection.
+        if self._redshift_pg_get_tabledef_available(dbname):
+            workers = max(1, min(DDL_WORKERS, len(tables), self.pool_max))
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                ddls = ex.map(lambda t: self.table_schema(t, schema=schema, dbname=dbname), tables)
+                return dict(zip(tables, ddls))
+
+        cols = self.execute(
+            """
+            SELECT
+              c.relname,
+              a.attnum,
+              a.attname,
+              pg_catalog.format_type(a.atttypid, a.atttypmod) AS data_type,
+              a.attnotnull AS not_null,
+              pg_get_expr(ad.adbin, ad.adrelid) AS default_expr,
+              a.attidentity AS identity_kind
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            LEFT JOIN pg_attrdef ad ON ad.adrelid = a.attrelid AND ad.adnum = a.attnum
+            WHERE c.relkind IN ('r','p')
+              AND a.attnum > 0
+              AND NOT a.attisdropped
+              AND n.nspname = %s
+            ORDER BY c.relname, a.attnum;
+            """,
+            (schema,),
+            fetch="all",
+            dbname=dbname,
+        ) or []
+
+        constraints = self.execute(
+            """
+            SELECT
+              c.relname,
+              con.conname,
+              con.contype,
+              pg_get_constraintdef(con.oid, true) AS condef
+            FROM pg_constraint con
+            JOIN pg_class c ON c.oid = con.conrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s
+            ORDER BY c.relname, con.contype DESC, con.conname;
+            """,
+            (schema,),
+            fetch="all",
+            dbname=dbname,
+        ) or []
+
+        cols_by_table = {t: [r[1:] for r in rows] for t, rows in groupby(cols, key=lambda r: r[0])}
+        cons_by_table = {t: [r[1:] for r in rows] for t, rows in groupby(constraints, key=lambda r: r[0])}
+        with self.borrow(dbname) as conn:
+            return {
+                t: self._build_create_table(conn, schema, t, cols_by_table.get(t, []), cons_by_table.get(t, []))
+                for t in tables
+            }
 
     def close(self) -> None:
-        if getattr(self, "conn", None):
+        with self._pools_lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
             try:
-                self.conn.close()
+                pool.closeall()
             except Exception:
                 pass
-            finally:
-                self.conn = None
+        with self._admin_lock:
+            if self._admin_conn is not None:
+                try:
+                    self._admin_conn.close()
+                except Exception:
+                    pass
+                finally:
+                    self._admin_conn = None
 
 
 # ---------- Example usage ----------
@@ -1,9 +1,25 @@
 
-import base64, io, sys, urllib.parse
+import base64, codecs, io, sys, urllib.parse
+from functools import lru_cache
+from werkzeug.exceptions import HTTPException
 from app import app  # must expose "app" (Flask instance)
 
 TEXT_LIKE = ("text/", "json", "xml", "javascript", "svg")
 
+@lru_cache(maxsize=64)
+def _classify(ctype):
+    """(is_text_like, charset) for a lowercased Content-Type; apps only ever send a handful."""
+    is_text_like = any(tok in ctype for tok in TEXT_LIKE)
+    # Respect explicit charset if present (unknown codecs fall back to utf-8)
+    charset = "utf-8"
+    if "charset=" in ctype:
+        charset = ctype.split("charset=", 1)[1].split(";", 1)[0].strip()
+        try:
+            codecs.lookup(charset)
+        except LookupError:
+            charset = "utf-8"
+    return is_text_like, charset
+
 def _is_http_v2(event):
     # Lambda Function URL and API Gateway HTTP API (v2)
     return isinstance(event.get("requestContext", {}).get("http"), dict) or "rawPath" in event
@@ -37,16 +53,12 @@ def _get_querystring(event):
 def _get_headers(event):
     return event.get("headers") or {}
 
-def _first_header(headers, name, default=None):
-    # case-insensitive single-value fetch
-    low = name.lower()
-    for k, v in headers.items():
-        if k.lower() == low:
-            return v
-    return default
+def _first_header(headers_lc, name, default=None):
+    # case-insensitive single-value fetch; headers_lc has lowercased keys (built once per request)
+    return headers_lc.get(name.lower(), default)
 
 def handler(event, context):
-    headers = _get_headers(event)
+    headers_lc = {k.lower(): v for k, v in _get_headers(event).items()}
 
     # method/path/query/body
     method = _get_method(event)
@@ -58,10 +70,10 @@ def handler(event, context):
     body_bytes = base64.b64decode(body) if is_b64 else body.encode("utf-8")
 
     # server + client info
-    scheme = _first_header(headers, "x-forwarded-proto", "https")
-    server_name = _first_header(headers, "host", "lambda")
-    server_port = _first_header(headers, "x-forwarded-port", "443" if scheme == "https" else "80")
-    remote_addr = (_first_header(headers, "x-forwarded-for", "") or "").split(",")[0].strip() or "0.0.0.0"
+    scheme = _first_header(headers_lc, "x-forwarded-proto", "https")
+    server_name = _first_header(headers_lc, "host", "lambda")
+    server_port = _first_header(headers_lc, "x-forwarded-port", "443" if scheme == "https" else "80")
+    remote_addr = (_first_header(headers_lc, "x-forwarded-for", "") or "").split(",")[0].strip() or "0.0.0.0"
 
     script_name = ""
     path_info = raw_path
@@ -87,17 +99,16 @@ def handler(event, context):
     }
 
     # Pass through Content-Type/Length
-    ctype = _first_header(headers, "content-type")
+    ctype = _first_header(headers_lc, "content-type")
     if ctype:
         environ["CONTENT_TYPE"] = ctype
 
     # Map other headers to HTTP_*
-    for k, v in headers.items():
-        kl = k.lower()
-        if kl in ("content-type", "content_length"):
-            continue
-        http_key = "HTTP_" + k.upper().replace("-", "_")
-        environ[http_key] = v
+    environ.update({
+        "HTTP_" + kl.upper().replace("-", "_"): v
+        for kl, v in headers_lc.items()
+        if kl not in ("content-type", "content_length")
+    })
 
     # Run the WSGI app
     status_holder = {}
@@ -112,13 +123,20 @@ def handler(event, context):
     result = app(environ, start_response)
 
     try:
-        chunks = []
-        for chunk in result:
-            if isinstance(chunk, (bytes, bytearray)):
-                chunks.append(bytes(chunk))
-            else:
-                chunks.append(str(chunk).encode("utf-8"))
-        body_out = b"".join(chunks)
+        # Flask hands back a ClosingIterator (no len()), usually yielding a single bytes chunk;
+        # in that case use it as-is instead of copying it through bytes()/join.
+        chunks = [c if isinstance(c, (bytes, bytearray)) else str(c).encode("utf-8") for c in result]
+        body_out = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    except Exception as e:
+        # A streamed body failed after start_response (e.g. a SQL error past the first CSV chunk).
+        # The body is buffered here anyway, so answer with the error instead of a bare Lambda 502.
+        if isinstance(e, HTTPException):
+            code, message = e.code, e.description
+        else:
+            code, message = 500, str(e)
+        status_holder["status"] = str(code)
+        headers_holder[:] = [("Content-Type", "text/plain; charset=utf-8")]
+        body_out = str(message).encode("utf-8")
     finally:
         if hasattr(result, "close"):
             result.close()
@@ -143,18 +161,10 @@ def handler(event, context):
 
     # Decide if body is text-like
     resp_ctype = (headers_out.get("Content-Type") or headers_out.get("content-type") or "").lower()
-    is_text_like = any(tok in resp_ctype for tok in TEXT_LIKE)
-
-    # Respect explicit charset if present
-    charset = "utf-8"
-    if "charset=" in resp_ctype:
-        charset = resp_ctype.split("charset=", 1)[1].split(";", 1)[0].strip()
+    is_text_like, charset = _classify(resp_ctype)
 
     if is_text_like:
-        try:
-            body_str = body_out.decode(charset, errors="replace")
-        except LookupError:
-            body_str = body_out.decode("utf-8", errors="replace")
+        body_str = body_out.decode(charset, errors="replace")
         is_base64 = False
     else:
         body_str = base64.b64encode(body_out).decode("ascii")
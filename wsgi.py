@@ -0,0 +1,11 @@
+# WSGI entry point for running outside Lambda under gunicorn's gevent worker, e.g.
+#   gunicorn -k gevent -w $(nproc) --worker-connections 50 -b 0.0.0.0:8080 wsgi:app
+# Patching must happen before app (and psycopg2 connections) are created, so a greenlet
+# waiting on a libpq socket yields to other requests instead of blocking the worker.
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from app import app  # noqa: E402